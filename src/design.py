@@ -8,7 +8,7 @@ precise masked editing workflows.
 Features:
     - Single image and batch image processing
     - Mask-based targeted editing
-    - Base64 image handling
+    - Raw bytes or base64 image input
     - Automatic file management
 
 Dependencies:
@@ -17,37 +17,65 @@ Dependencies:
 
 Usage:
     import asyncio
-    import base64
-    from design import generate_edit_image
+    from design import generate_edit_image, close_session
     
     async def main():
         with open("image.jpg", "rb") as f:
-            image_data = base64.b64encode(f.read()).decode("utf-8")
+            image_data = f.read()
         
         result = await generate_edit_image("Make it futuristic", image_data)
         print(f"Edited image: {result}")
+        await close_session()
     
     asyncio.run(main())
 """
 
-import io
 import os
 import uuid
 import time
-import base64
+import binascii
+import asyncio
 import aiohttp
+import aiofiles
 from pathlib import Path
+from types import MappingProxyType
+from collections.abc import Mapping
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+try:
+    from .session import close_session, get_session
+except ImportError:
+    from session import close_session, get_session
+
+# Load environment variables from .env file, unless they are already set
+if not os.getenv("AZURE_IMAGE_ENDPOINT"):
+    load_dotenv()
 
 
 BASE_DIR = Path(__file__).resolve().parent
 
+# Output directory for generated images, created once at import
+GENERATED_DIR = BASE_DIR / "generated"
+GENERATED_DIR.mkdir(exist_ok=True)
+
 AZURE_IMAGE_ENDPOINT = os.environ.get("AZURE_IMAGE_ENDPOINT", "EMPTY").rstrip("/")
 AZURE_IMAGE_API_KEY = os.environ.get("AZURE_IMAGE_API_KEY", "EMPTY")
 
+# Request configuration, built once at import. Headers are read-only; copy
+# them ({**_HEADERS, ...}) when a request needs extra headers.
+API_VERSION = "2025-04-01-preview"
+DEPLOYMENT_NAME = "gpt-image-1"
+_EDIT_URL = f"{AZURE_IMAGE_ENDPOINT}/openai/deployments/{DEPLOYMENT_NAME}/images/edits?api-version={API_VERSION}"
+_HEADERS: Mapping[str, str] = MappingProxyType({
+    "api-key": AZURE_IMAGE_API_KEY,
+})
+
+# Form fields that are the same for every edit request
+_STATIC_FIELDS = (
+    ("size", "1024x1024"),
+    ("quality", "high"),
+)
+
 
 async def save_image(image_base64: str, filename: str) -> None:
     """
@@ -59,24 +87,49 @@ async def save_image(image_base64: str, filename: str) -> None:
         
     The image is saved in the 'generated/' directory relative to this module.
     """
-    image_bytes = base64.b64decode(image_base64)
-    output_path = BASE_DIR / f"generated/{filename}"
-    
-    # Ensure the generated directory exists
-    output_path.parent.mkdir(exist_ok=True)
+    image_bytes = binascii.a2b_base64(image_base64)
+    output_path = GENERATED_DIR / filename
+
+    async with aiofiles.open(output_path, "wb") as f:
+        await f.write(image_bytes)
+
+
+async def load_image(path: str | Path) -> bytes:
+    """
+    Read an image file asynchronously.
     
-    with open(output_path, "wb") as f:
-        f.write(image_bytes)
+    Args:
+        path: Path to the image file
+        
+    Returns:
+        bytes: Raw image data, ready to pass to generate_edit_image
+    """
+    async with aiofiles.open(path, "rb") as f:
+        return await f.read()
 
 
-async def generate_edit_image(description: str, image: str | list[str], mask: str | None = None) -> str:
+def _image_bytes(data: bytes | str) -> bytes:
+    """
+    Return raw image bytes, decoding base64 input once at the API boundary.
+    """
+    if isinstance(data, str):
+        return binascii.a2b_base64(data)
+    return data
+
+
+async def generate_edit_image(
+    description: str,
+    image: bytes | str | list[bytes] | list[str],
+    mask: bytes | str | None = None,
+) -> str:
     """
     Generate or edit an image using AI based on a text description.
     
     Args:
         description: Text prompt describing the desired image transformation
-        image: Base64 encoded image data (single image or list of images)
-        mask: Optional base64 encoded mask for targeted editing
+        image: Raw image bytes (single image or list of images); base64
+            encoded strings are also accepted and decoded once
+        mask: Optional mask for targeted editing, as raw bytes or base64
         
     Returns:
         str: Filename of the generated image (stored in generated/ directory)
@@ -92,67 +145,88 @@ async def generate_edit_image(description: str, image: str | list[str], mask: st
         - Quality: High
         - Format: PNG
     """
-    api_version = "2025-04-01-preview"
-    deployment_name = "gpt-image-1"
-    endpoint = f"{AZURE_IMAGE_ENDPOINT}/openai/deployments/{deployment_name}/images/edits?api-version={api_version}"
-    size: str = "1024x1024"
-    quality: str = "high"
+    session = get_session()
 
-    async with aiohttp.ClientSession() as session:
-        headers = {
-            "api-key": AZURE_IMAGE_API_KEY,
-        }
+    # decode everything once, then add the multipart fields in a single pass
+    if isinstance(image, list):
+        parts = [
+            (f"image[{i}]", _image_bytes(img_data), f"image_{i}.png")
+            for i, img_data in enumerate(image)
+        ]
+    else:
+        parts = [("image", _image_bytes(image), "image.png")]
+    if mask:
+        parts.append(("mask", _image_bytes(mask), "mask.png"))
 
-        form_data = aiohttp.FormData()
+    form_data = aiohttp.FormData()
+    for name, data, filename in parts:
+        form_data.add_field(name, data, filename=filename, content_type="image/png")
+    form_data.add_field("prompt", description, content_type="text/plain")
+    for name, value in _STATIC_FIELDS:
+        form_data.add_field(name, value, content_type="text/plain")
 
-    
-        if isinstance(image, list):
-            for i, img_data in enumerate(image):
-                img = io.BytesIO(base64.b64decode(img_data))
-                form_data.add_field(
-                    f"image[{i}]",
-                    img,
-                    filename=f"image_{i}.png",
-                    content_type="image/png",
-                )
-        else:
-            img = io.BytesIO(base64.b64decode(image))
-            form_data.add_field(
-                "image", img, filename="image.png", content_type="image/png"
-            )
-
-        form_data.add_field("prompt", description, content_type="text/plain")
-        form_data.add_field("size", size, content_type="text/plain")
-        form_data.add_field("quality", quality, content_type="text/plain")
-        if mask:
-            mask_data = io.BytesIO(base64.b64decode(mask))
-            form_data.add_field(
-                "mask", mask_data, filename="mask.png", content_type="image/png"
-            )
-
-        async with session.post(endpoint, headers=headers, data=form_data) as response:
-            if response.status == 200:
-                result = await response.json()
-                if result and "data" in result and len(result["data"]) > 0:
-                    image_base64 = result["data"][0]["b64_json"]
-                    image_name = f"{str(uuid.uuid4())}.png"
-                    await save_image(image_base64, image_name)
-                    return image_name
-            else:
-                error_message = await response.text()
-                raise Exception(f"Error generating image: {error_message}")
+    try:
+        async with session.post(_EDIT_URL, headers=_HEADERS, data=form_data) as response:
+            result = await response.json()
+    except aiohttp.ClientResponseError as e:
+        raise Exception(f"Error generating image: {e.message}") from e
 
+    try:
+        image_base64 = result["data"][0]["b64_json"]
+    except (KeyError, IndexError, TypeError) as e:
+        raise Exception(f"Error generating image: unexpected response {result}") from e
 
-async def image_edit_inspiration():
+    image_name = f"{str(uuid.uuid4())}.png"
+    await save_image(image_base64, image_name)
+    return image_name
+
+
+async def generate_edit_images_parallel(
+    description: str,
+    images: list[bytes] | list[str],
+    concurrency: int = 8,
+) -> list[str]:
     """
-    Example function demonstrating inspiration-based image editing.
+    Apply the same edit to several images independently and concurrently.
     
-    This function loads all images from the images/ directory and applies
-    a creative transformation based on the provided description. It showcases
-    batch processing capabilities for multiple source images.
+    Args:
+        description: Text prompt describing the desired image transformation
+        images: Images to edit, each as raw bytes or base64
+        concurrency: Maximum number of edit requests in flight at once
+        
+    Returns:
+        list[str]: Filenames of the generated images, in the order of `images`
+        
+    Raises:
+        ValueError: If concurrency is less than 1
+        Exception: If any edit fails; the remaining edits are cancelled first
+        
+    Unlike passing a list to generate_edit_image, which combines all images
+    into a single result, this produces one edited image per input. Requests
+    share the module's connection pool.
     """
-    # Example usage
-    description = """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(img: bytes | str) -> str:
+        async with sem:
+            return await generate_edit_image(description, img)
+
+    tasks = [asyncio.create_task(_one(img)) for img in images]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        # don't leave the other edits running unobserved
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+# Example prompts, whitespace-normalized once at import
+_INSPIRATION_PROMPT = " ".join("""
     Create a futuristic Santa Monica cityscape at night, with neon lights reflecting off wet streets,
     showcasing a blend of modern architecture and classic elements. The scene should be vibrant and bustling,
     with people walking, futuristic vehicles, and a clear night sky filled with stars.
@@ -160,18 +234,30 @@ async def image_edit_inspiration():
     never sleeps, blending the charm of Santa Monica with a futuristic twist.
     The image should be rich in detail, with a focus on the interplay of light and shadow
     to create a dynamic and immersive California environment.
-    """.replace(
-        "\n", " "
-    ).strip()
-    # load all images from the images directory
-    image = [
-        base64.b64encode(open(f"{BASE_DIR}/images/{img}", "rb").read()).decode("utf-8")
-        for img in os.listdir(f"{BASE_DIR}/images")
-        if not img.startswith("_")
-    ]
+""".split())
+
+_MASK_PROMPT = " ".join("""
+    A contemplative person in a serene setting, surrounded by nature contemplating the mysteries of the universe.
+""".split())
+
+
+async def image_edit_inspiration():
+    """
+    Example function demonstrating inspiration-based image editing.
+    
+    This function loads all images from the images/ directory and applies
+    a creative transformation based on the provided description. It showcases
+    batch processing capabilities for multiple source images. All images are
+    sent in one request because they jointly inspire a single result; use
+    generate_edit_images_parallel to edit each image independently.
+    """
+    # load all images from the images directory concurrently
+    with os.scandir(BASE_DIR / "images") as it:
+        entries = [e for e in it if e.is_file() and not e.name.startswith("_")]
+    image = await asyncio.gather(*(load_image(e.path) for e in entries))
 
     start_time = time.time()
-    result = await generate_edit_image(description, image)
+    result = await generate_edit_image(_INSPIRATION_PROMPT, image)
     end_time = time.time()
 
     print(f"Result: {result}")
@@ -186,24 +272,14 @@ async def image_edit_with_mask():
     It loads a scene image and its corresponding mask, then applies changes
     only to the masked areas while preserving the rest of the image.
     """
-    # Example usage
-    description = """
-    A contemplative person in a serene setting, surrounded by nature contemplating the mysteries of the universe.
-    """.replace(
-        "\n", " "
-    ).strip()
-    # load all images from the images directory
-
-    scene = base64.b64encode(open(f"{BASE_DIR}/scene/scene.png", "rb").read()).decode(
-        "utf-8"
+    # load the scene and its mask concurrently
+    scene, mask = await asyncio.gather(
+        load_image(BASE_DIR / "scene" / "scene.png"),
+        load_image(BASE_DIR / "scene" / "_scene_mask.png"),
     )
 
-    mask = base64.b64encode(
-        open(f"{BASE_DIR}/scene/_scene_mask.png", "rb").read()
-    ).decode("utf-8")
-
     start_time = time.time()
-    result = await generate_edit_image(description, scene, mask=mask)
+    result = await generate_edit_image(_MASK_PROMPT, scene, mask=mask)
     end_time = time.time()
 
     print(f"Result: {result}")
@@ -211,7 +287,17 @@ async def image_edit_with_mask():
 
 
 if __name__ == "__main__":
-    import asyncio
+    # use the faster libuv-based event loop when it is installed
+    try:
+        from uvloop import run
+    except ImportError:
+        from asyncio import run
+
+    async def main():
+        try:
+            #await image_edit_inspiration()
+            await image_edit_with_mask()
+        finally:
+            await close_session()
 
-    #asyncio.run(image_edit_inspiration())
-    asyncio.run(image_edit_with_mask())
+    run(main())
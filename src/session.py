@@ -0,0 +1,91 @@
+"""
+Bibble Shared HTTP Session
+
+This module owns the single aiohttp session used by the video and design
+modules, so both share one connection pool (keep-alive, TLS sessions and DNS
+cache) and one close_session() call releases everything.
+
+Usage:
+    import asyncio
+    from video import sora_video_generation
+    from session import close_session
+
+    async def main():
+        try:
+            await sora_video_generation("A peaceful lake scene")
+        finally:
+            await close_session()
+
+    asyncio.run(main())
+"""
+
+import asyncio
+import aiohttp
+
+# Shared HTTP session, created lazily so connections are reused across calls.
+# A session is bound to the event loop it was created on, so remember it.
+_SESSION: aiohttp.ClientSession | None = None
+_SESSION_LOOP: asyncio.AbstractEventLoop | None = None
+
+
+async def _raise_for_status(response: aiohttp.ClientResponse) -> None:
+    """
+    Raise ClientResponseError for 4xx/5xx responses, keeping the error body.
+
+    Used as the session's raise_for_status hook so error handling stays off
+    the success path while still surfacing the service's error message.
+    """
+    if response.status >= 400:
+        raise aiohttp.ClientResponseError(
+            response.request_info,
+            response.history,
+            status=response.status,
+            message=await response.text(),
+            headers=response.headers,
+        )
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Return the shared HTTP session, creating it on first use.
+
+    Reusing one session keeps the connection pool alive between requests to
+    the Azure endpoints, so repeated calls (such as status polls) skip the
+    TLS handshake. A new session is created when called from a different
+    event loop, e.g. a later asyncio.run().
+    """
+    global _SESSION, _SESSION_LOOP
+    loop = asyncio.get_running_loop()
+    if _SESSION is not None and _SESSION_LOOP is not loop:
+        # left over from an earlier asyncio.run(); its loop can no longer
+        # close it, so just drop it
+        _SESSION.detach()
+        _SESSION = None
+    if _SESSION is None or _SESSION.closed:
+        _SESSION_LOOP = loop
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=50,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True,
+            ),
+            raise_for_status=_raise_for_status,
+        )
+    return _SESSION
+
+
+async def close_session() -> None:
+    """
+    Close the shared HTTP session.
+
+    Call this before the event loop shuts down to release pooled connections.
+    """
+    global _SESSION, _SESSION_LOOP
+    if _SESSION is not None and not _SESSION.closed:
+        if _SESSION_LOOP is asyncio.get_running_loop():
+            await _SESSION.close()
+        else:
+            _SESSION.detach()
+    _SESSION = None
+    _SESSION_LOOP = None
@@ -11,58 +11,278 @@ Dependencies:
 
 Usage:
     import asyncio
-    from video import sora_video_generation
+    from video import sora_video_generation, close_session
     
     async def main():
         video_path = await sora_video_generation("A peaceful lake scene", seconds=10)
         print(f"Video generated: {video_path}")
+        await close_session()
     
     asyncio.run(main())
 """
 
 import os
+import math
 import time
+import random
 import asyncio
 import aiohttp
 from pathlib import Path
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from types import MappingProxyType
+from collections.abc import Mapping
 from dotenv import load_dotenv
-from aiohttp.streams import StreamReader
 
-# Load environment variables from .env file
-load_dotenv()
+try:
+    from .session import close_session, get_session
+except ImportError:
+    from session import close_session, get_session
+
+try:
+    import orjson
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+# Load environment variables from .env file, unless they are already set
+if not os.getenv("AZURE_SORA_ENDPOINT"):
+    load_dotenv()
 
 
 BASE_DIR = Path(__file__).resolve().parent
 
+# Output directory for generated videos, created once at import
+GENERATED_DIR = BASE_DIR / "generated"
+GENERATED_DIR.mkdir(exist_ok=True)
+
+# Size of each chunk read from the response, and how much to buffer
+# before handing the chunks to the kernel in a single write
+CHUNK_SIZE = 64 * 1024
+FLUSH_SIZE = 1024 * 1024
+
+# Status polling backoff: start fast for short jobs, back off for long ones
+POLL_INITIAL_DELAY = 1.0
+POLL_MAX_DELAY = 15.0
+POLL_BACKOFF = 1.5
+
+# Status poll responses that mean "try again later" rather than failure
+RETRY_STATUSES = (429, 503)
+
+# Default cap on simultaneous Sora jobs; tune to the deployment's job quota
+MAX_CONCURRENT_JOBS = 2
+
 AZURE_SORA_ENDPOINT = os.environ.get("AZURE_SORA_ENDPOINT", "EMPTY").rstrip("/")
 AZURE_SORA_API_KEY = os.environ.get("AZURE_SORA_API_KEY", "EMPTY")
 
+# Request configuration, built once at import. Headers are read-only; copy
+# them ({**_HEADERS, ...}) when a request needs extra headers.
+API_VERSION = "preview"
+_SORA_CREATE_URL = f"{AZURE_SORA_ENDPOINT}/openai/v1/video/generations/jobs?api-version={API_VERSION}"
+_SORA_STATUS_TEMPLATE = AZURE_SORA_ENDPOINT + "/openai/v1/video/generations/jobs/{}?api-version=" + API_VERSION
+_SORA_CONTENT_TEMPLATE = AZURE_SORA_ENDPOINT + "/openai/v1/video/generations/{}/content/video?api-version=" + API_VERSION
+_HEADERS: Mapping[str, str] = MappingProxyType({
+    "Content-Type": "application/json",
+    "Authorization": f"Bearer {AZURE_SORA_API_KEY}",
+})
+
+# Job request fields that are the same for every video
+_SORA_BODY_BASE: Mapping[str, object] = MappingProxyType({
+    "width": 1920,
+    "height": 1080,
+    "n_variants": 1,
+    "model": "sora",
+})
 
-async def save_video(stream_reader: StreamReader, filename: str) -> str:
+
+def _next_poll_delay(delay: float, retry_after: str | None) -> tuple[float, bool]:
     """
-    Save a video stream to the local file system.
+    Compute the wait before the next status poll.
+    
+    Honors a Retry-After header from the service (seconds or an HTTP date),
+    never waiting less than POLL_INITIAL_DELAY so a zero or negative value
+    cannot stall the backoff. Otherwise grows the previous delay exponentially
+    up to POLL_MAX_DELAY.
+    
+    Returns:
+        tuple[float, bool]: The delay, and whether it was set by the service
+    """
+    if retry_after:
+        try:
+            requested = float(retry_after)
+        except ValueError:
+            try:
+                when = parsedate_to_datetime(retry_after)
+            except (TypeError, ValueError):
+                requested = math.nan
+            else:
+                requested = (when - datetime.now(timezone.utc)).total_seconds()
+        if math.isfinite(requested):
+            return max(POLL_INITIAL_DELAY, requested), True
+    return min(delay * POLL_BACKOFF, POLL_MAX_DELAY), False
+
+
+def _write_chunks(fd: int, chunks: list[bytes]) -> None:
+    """
+    Write all buffered chunks to a file descriptor.
+    
+    Uses a single writev(2) call where available, finishing any short write
+    with plain writes.
+    """
+    if hasattr(os, "writev"):
+        written = os.writev(fd, chunks)
+        if written == sum(len(c) for c in chunks):
+            return
+        data = memoryview(b"".join(chunks))[written:]
+    else:
+        data = memoryview(b"".join(chunks))
+    while data:
+        data = data[os.write(fd, data):]
+
+
+async def save_video(response: aiohttp.ClientResponse, filename: str) -> str:
+    """
+    Save a video response to the local file system.
     
     Args:
-        stream_reader: Async stream reader containing video data
+        response: HTTP response whose body contains the video data
         filename: Name for the output video file (should include .mp4 extension)
         
     Returns:
         str: Full path to the saved video file
         
-    The video is saved in the 'generated/' directory relative to this module.
+    The video is streamed to disk in chunks so it is never held in memory as a
+    whole. Chunks are batched up to FLUSH_SIZE per write, and writes run in the
+    default executor so they do not block the event loop. It is saved in the
+    'generated/' directory relative to this module; a partial file is removed
+    if the download fails or is cancelled.
     """
-    video_bytes = await stream_reader.read()
-    output_path = BASE_DIR / f"generated/{filename}"
-    
-    # Ensure the generated directory exists
-    output_path.parent.mkdir(exist_ok=True)
-    
-    with open(output_path, "wb") as f:
-        f.write(video_bytes)
+    output_path = GENERATED_DIR / filename
+    loop = asyncio.get_running_loop()
+
+    fd = os.open(
+        output_path,
+        os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0),
+        0o644,
+    )
+    pending: asyncio.Future | None = None
+    completed = False
+
+    def _cleanup(fut: asyncio.Future | None = None) -> None:
+        if fut is not None and not fut.cancelled():
+            fut.exception()  # mark as retrieved; the caller already failed
+        os.close(fd)
+        if not completed:
+            # don't leave a truncated video behind
+            output_path.unlink(missing_ok=True)
+
+    try:
+        chunks: list[bytes] = []
+        total = 0
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            chunks.append(chunk)
+            total += len(chunk)
+            # also flush on chunk count to stay well under the IOV_MAX limit
+            if total >= FLUSH_SIZE or len(chunks) >= 256:
+                # shield the write so cancellation cannot mark it done while
+                # the worker thread is still using the descriptor
+                pending = loop.run_in_executor(None, _write_chunks, fd, chunks)
+                await asyncio.shield(pending)
+                chunks = []
+                total = 0
+        if chunks:
+            pending = loop.run_in_executor(None, _write_chunks, fd, chunks)
+            await asyncio.shield(pending)
+        completed = True
+    finally:
+        if pending is not None and not pending.done():
+            # cancelled mid-write: close only once the worker is finished
+            pending.add_done_callback(_cleanup)
+        else:
+            _cleanup()
 
     return str(output_path)
 
 
+async def _poll_until_done(
+    session: aiohttp.ClientSession, job_id: str, headers: Mapping[str, str]
+) -> dict:
+    """
+    Poll a video generation job until it reaches a terminal state.
+    
+    Args:
+        session: HTTP session to poll with
+        job_id: Id of the video generation job
+        headers: Request headers for the Sora endpoint
+        
+    Returns:
+        dict: The last status payload received for the job
+    """
+    status_url = _SORA_STATUS_TEMPLATE.format(job_id)
+    status = "started"
+    status_data: dict = {}
+    delay = POLL_INITIAL_DELAY
+    server_delay = False
+    etag: str | None = None
+    while status not in ("succeeded", "failed", "cancelled"):
+        # async sleep to avoid hitting the API too frequently; jitter keeps
+        # concurrent jobs from polling in lockstep, but a delay requested by
+        # the service is honored as-is
+        if server_delay:
+            await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(delay * (0.8 + 0.4 * random.random()))
+
+        # send the last ETag so an unchanged job can answer 304 with no body
+        poll_headers = headers if etag is None else {**headers, "If-None-Match": etag}
+        try:
+            async with session.get(status_url, headers=poll_headers) as status_response:
+                delay, server_delay = _next_poll_delay(
+                    delay, status_response.headers.get("Retry-After")
+                )
+                if status_response.status == 304:
+                    continue
+
+                etag = status_response.headers.get("ETag", etag)
+                status_data = _json_loads(await status_response.read())
+                if status != status_data["status"]:
+                    print(f"Video generation {job_id} status: {status_data['status']}")
+
+                status = status_data["status"]
+        except aiohttp.ClientResponseError as e:
+            # throttled or temporarily unavailable: wait as asked, then retry
+            if e.status not in RETRY_STATUSES:
+                raise
+            retry_after = e.headers.get("Retry-After") if e.headers else None
+            delay, server_delay = _next_poll_delay(delay, retry_after)
+
+    return status_data
+
+
+async def _download(
+    session: aiohttp.ClientSession,
+    generation_id: str,
+    headers: Mapping[str, str],
+    filename: str,
+) -> str:
+    """
+    Download a finished generation's video into the generated/ directory.
+    
+    Returns:
+        str: Full path to the saved video file
+    """
+    video_url = _SORA_CONTENT_TEMPLATE.format(generation_id)
+    async with session.get(video_url, headers=headers) as video_response:
+        return await save_video(video_response, filename)
+
+
 async def sora_video_generation(description: str, seconds: int = 10) -> str:
     """
     Generate a video using OpenAI's Sora model via Azure OpenAI.
@@ -83,86 +303,95 @@ async def sora_video_generation(description: str, seconds: int = 10) -> str:
         - Model: Sora
     """
 
-    api_version = "preview"
-    create_url = f"{AZURE_SORA_ENDPOINT}/openai/v1/video/generations/jobs?api-version={api_version}"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {AZURE_SORA_API_KEY}",
-    }
-    body = {
-        "prompt": description,
-        "width": 1920,
-        "height": 1080,
-        "n_seconds": seconds,
-        "n_variants": 1,
-        "model": "sora",
-    }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.post(create_url, headers=headers, json=body) as response:
-            if response.status != 201:
-                error_response = await response.json()
-                print(error_response)
-                return ""
+    body = {**_SORA_BODY_BASE, "prompt": description, "n_seconds": seconds}
 
-            response_data = await response.json()
-            job_id = response_data["id"]
+    session = get_session()
+    try:
+        async with session.post(
+            _SORA_CREATE_URL, headers=_HEADERS, data=_json_dumps(body)
+        ) as response:
+            job_id = _json_loads(await response.read())["id"]
 
-            status_url = f"{AZURE_SORA_ENDPOINT}/openai/v1/video/generations/jobs/{job_id}?api-version={api_version}"
-            status = "started"
-            status_data: dict = {}
-            while status not in ("succeeded", "failed", "cancelled"):
-                # async sleep to avoid hitting the API too frequently
-                await asyncio.sleep(5)
+        status_data = await _poll_until_done(session, job_id, _HEADERS)
+        if status_data.get("status") != "succeeded":
+            return ""
 
-                async with session.get(status_url, headers=headers) as status_response:
-                    if status_response.status != 200:
-                        error_response = await status_response.json()
-                        print(error_response)
-                        return ""
+        try:
+            generation_id = status_data["generations"][0]["id"]
+        except (KeyError, IndexError):
+            return ""
 
-                    status_data = await status_response.json()
-                    if status != status_data["status"]:
-                        print(f"Video generation status: {status_data['status']}")
+        return await _download(session, generation_id, _HEADERS, f"{job_id}.mp4")
+    except aiohttp.ClientResponseError as e:
+        print(f"Video generation ({description[:60]!r}) error {e.status}: {e.message}")
+        return ""
 
-                    status = status_data["status"]
 
-            if status == "succeeded":
-                generations = status_data.get("generations", [])
-                if generations:
-                    generation_id = generations[0].get("id")
-                    video_url = f"{AZURE_SORA_ENDPOINT}/openai/v1/video/generations/{generation_id}/content/video?api-version={api_version}"
-                    async with session.get(
-                        video_url, headers=headers
-                    ) as video_response:
-                        if video_response.status != 200:
-                            error_response = await video_response.json()
-                            print(error_response)
+async def sora_generate_many(
+    descriptions: list[str],
+    seconds: int = 10,
+    concurrency: int = MAX_CONCURRENT_JOBS,
+) -> list[str]:
+    """
+    Generate several videos concurrently.
+    
+    Args:
+        descriptions: Text descriptions, one per video
+        seconds: Duration of each video in seconds (default: 10)
+        concurrency: Maximum number of jobs running at once
+        
+    Returns:
+        list[str]: Paths to the generated videos in the order of `descriptions`;
+            an entry is an empty string if that generation failed
+        
+    Raises:
+        ValueError: If concurrency is less than 1
+        
+    Jobs share the module's connection pool and poll independently, so the
+    batch takes roughly as long as its slowest job rather than the sum of all.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
 
-                            return ""
+    sem = asyncio.Semaphore(concurrency)
 
-                        # Save the video content
-                        video_blob = await save_video(video_response.content, f"{job_id}.mp4")
-                        return video_blob
-    return ""
+    async def _one(index: int, description: str) -> str:
+        async with sem:
+            try:
+                return await sora_video_generation(description, seconds)
+            except Exception as e:
+                # connection errors, timeouts or malformed responses fail this
+                # job only, so gather never leaves sibling tasks unawaited
+                print(f"Video generation {index} ({description[:60]!r}) failed: {e!r}")
+                return ""
 
+    tasks = [asyncio.create_task(_one(i, d)) for i, d in enumerate(descriptions)]
+    return await asyncio.gather(*tasks)
 
-if __name__ == "__main__":
-    import asyncio
 
-    # Example usage
-    description = """
+# Example prompt, whitespace-normalized once at import
+_EXAMPLE_PROMPT = " ".join("""
     A serene landscape with rolling hills, a clear blue sky, and a gentle stream flowing through the scene. The hills are covered in lush green grass, and wildflowers 
     bloom in various colors. In the distance, there are majestic mountains with snow-capped peaks. The sun is shining brightly, casting soft shadows on the ground. 
     A few fluffy clouds drift lazily across the sky, adding to the peaceful atmosphere.
-    """.replace(
-        "\n", " "
-    ).strip()
-    # load all images from the images directory
-    
+""".split())
+
+
+if __name__ == "__main__":
+    # use the faster libuv-based event loop when it is installed
+    try:
+        from uvloop import run
+    except ImportError:
+        from asyncio import run
+
+    async def main():
+        try:
+            return await sora_video_generation(_EXAMPLE_PROMPT, 10)
+        finally:
+            await close_session()
 
     start_time = time.time()
-    result = asyncio.run(sora_video_generation(description, 10))
+    result = run(main())
     end_time = time.time()
 
     print(f"Result: {result}")